@@ -0,0 +1,230 @@
+import hashlib
+import json
+from logging import getLogger
+import os
+from pathlib import Path
+import re
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from filelock import FileLock
+from tox.config.sets import EnvConfigSet
+from virtualenv.discovery.builtin import get_interpreter
+
+logger = getLogger(__name__)
+
+ENV_STORE_PATH_VARIABLE = "TOX_GH_ACTIONS_ENV_STORE"
+ENV_STORE_MAX_SIZE_VARIABLE = "TOX_GH_ACTIONS_ENV_STORE_MAX_SIZE_MB"
+DEFAULT_ENV_STORE_MAX_SIZE_MB = 5120
+
+# Marker written to an env dir restored from or saved to the store.
+# tox empties the env dir when it recreates the env, which removes this marker.
+RESTORED_MARKER = ".tox-gh-actions-restored"
+
+# Files and directories in an env dir which are not stored.
+# log and tmp are recreated by tox on every run.
+IGNORED_ENV_FILES = ("log", "tmp", RESTORED_MARKER)
+
+
+class EnvStore:
+    """Persistent store of tox environments shared by jobs on the same runner
+
+    Each entry is a copy of an env dir keyed by get_env_key().
+    All operations hold a file lock so that concurrent jobs on the same machine
+    can share the store safely. When the total size of the entries exceeds
+    the limit, the least recently used entries are removed.
+    """
+
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "store.lock"
+
+    def __init__(self, path: Path, max_size: int) -> None:
+        self.path = path
+        self.max_size = max_size
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = FileLock(str(self.path / self.LOCK_FILE))
+
+    def restore(self, key: str, env_dir: Path) -> bool:
+        """Copy a stored env to env_dir. Returns True when the env is restored"""
+        with self._lock:
+            index = self._load_index()
+            if key not in index:
+                logger.debug("env is not found in the store: %s", key)
+                return False
+            if env_dir.exists():
+                logger.debug("not restoring env because env dir exists: %s", env_dir)
+                return False
+            logger.info("restoring env from the store: %s -> %s", key, env_dir)
+            try:
+                shutil.copytree(str(self.path / key), str(env_dir), symlinks=True)
+            except FileExistsError:
+                # Created by someone else after the check above
+                raise
+            except OSError:
+                # Don't leave a partial env which tox may accept as valid
+                shutil.rmtree(str(env_dir), ignore_errors=True)
+                raise
+            (env_dir / RESTORED_MARKER).touch()
+            index[key]["last_used"] = time.time()
+            self._save_index(index)
+        return True
+
+    def save(self, key: str, env_dir: Path) -> bool:
+        """Copy env_dir to the store. Returns True when the entry is added
+
+        An existing entry is replaced when tox created the env in env_dir
+        instead of using the env restored from the entry.
+        """
+        with self._lock:
+            index = self._load_index()
+            if key in index and (env_dir / RESTORED_MARKER).exists():
+                logger.debug("env is already in the store: %s", key)
+                index[key]["last_used"] = time.time()
+                self._save_index(index)
+                return False
+            logger.info("saving env to the store: %s -> %s", env_dir, key)
+            entry = self.path / key
+            # Copy to a temporary directory first to avoid leaving a partial entry
+            tmp_dir = Path(tempfile.mkdtemp(prefix=".tmp-", dir=str(self.path)))
+            try:
+                shutil.copytree(
+                    str(env_dir),
+                    str(tmp_dir / "env"),
+                    symlinks=True,
+                    ignore=lambda d, _: IGNORED_ENV_FILES if d == str(env_dir) else (),
+                )
+                size = get_dir_size(tmp_dir / "env")
+                # Remove an outdated entry or a leftover of an interrupted save
+                index.pop(key, None)
+                shutil.rmtree(str(entry), ignore_errors=True)
+                if size > self.max_size:
+                    logger.warning(
+                        "tox-gh-actions won't store %s because its size (%d bytes) "
+                        "exceeds the limit of the env store (%d bytes)",
+                        env_dir,
+                        size,
+                        self.max_size,
+                    )
+                    self._save_index(index)
+                    return False
+                os.replace(str(tmp_dir / "env"), str(entry))
+            finally:
+                shutil.rmtree(str(tmp_dir), ignore_errors=True)
+            (env_dir / RESTORED_MARKER).touch()
+            index[key] = {"size": size, "last_used": time.time()}
+            self._remove_unknown_files(index)
+            self._evict(index)
+            self._save_index(index)
+        return True
+
+    def _remove_unknown_files(self, index: Dict[str, Dict[str, Any]]) -> None:
+        # Remove directories not in the index, such as entries orphaned by a broken
+        # index and temporary directories left by an interrupted save.
+        # All saves hold the lock, so nobody else is using them.
+        for path in self.path.iterdir():
+            if path.is_dir() and path.name not in index:
+                logger.info("removing an unknown directory in the env store: %s", path)
+                shutil.rmtree(str(path), ignore_errors=True)
+
+    def _evict(self, index: Dict[str, Dict[str, Any]]) -> None:
+        total_size = sum(entry["size"] for entry in index.values())
+        keys = sorted(index, key=lambda k: index[k]["last_used"])
+        while total_size > self.max_size and keys:
+            key = keys.pop(0)
+            logger.info("evicting env from the store: %s", key)
+            shutil.rmtree(str(self.path / key), ignore_errors=True)
+            total_size -= index.pop(key)["size"]
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path / self.INDEX_FILE) as f:
+                index: Dict[str, Dict[str, Any]] = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning("ignoring a broken index of the env store: %s", self.path)
+            return {}
+        # Forget entries removed from the disk by someone else
+        return {k: v for k, v in index.items() if (self.path / k).is_dir()}
+
+    def _save_index(self, index: Dict[str, Dict[str, Any]]) -> None:
+        tmp_path = self.path / (self.INDEX_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(str(tmp_path), str(self.path / self.INDEX_FILE))
+
+
+def get_env_store() -> Optional[EnvStore]:
+    """Get the env store configured via environment variables, if any"""
+    path = os.environ.get(ENV_STORE_PATH_VARIABLE)
+    if not path:
+        return None
+    max_size_mb = DEFAULT_ENV_STORE_MAX_SIZE_MB
+    value = os.environ.get(ENV_STORE_MAX_SIZE_VARIABLE)
+    if value:
+        try:
+            max_size_mb = int(value)
+        except ValueError:
+            logger.warning(
+                "tox-gh-actions couldn't understand %s. ignoring the given value: %s",
+                ENV_STORE_MAX_SIZE_VARIABLE,
+                value,
+            )
+    try:
+        return EnvStore(Path(path), max_size_mb * 1024 * 1024)
+    except OSError as e:
+        logger.warning("tox-gh-actions couldn't use the env store %s: %s", path, e)
+        return None
+
+
+def get_env_key(env_conf: EnvConfigSet, discover: Sequence[str] = ()) -> str:
+    """Get a key of the env store from the env name, deps, and interpreter
+
+    The env dir is also a part of the key as virtual environments contain
+    absolute paths and can't be relocated.
+    """
+    deps: List[str] = []
+    if "deps" in env_conf:
+        try:
+            options, requirements = env_conf["deps"].unroll()
+            deps = options + requirements
+        except ValueError:  # tox raises this when deps only have options
+            deps = env_conf["deps"].lines()
+    source = {
+        "env_dir": str(env_conf["env_dir"]),
+        "deps": deps,
+        "base_python": env_conf["base_python"] if "base_python" in env_conf else [],
+        "python": get_base_python(env_conf, discover),
+    }
+    digest = hashlib.sha256(json.dumps(source, sort_keys=True).encode()).hexdigest()
+    name = re.sub(r"[^\w.-]", "_", env_conf.env_name or "")
+    return name + "-" + digest[:16]
+
+
+def get_base_python(
+    env_conf: EnvConfigSet, discover: Sequence[str]
+) -> Optional[List[str]]:
+    """Get the executable and version of the interpreter used by the env
+
+    The interpreter is resolved from base_python in the same way as tox.
+    """
+    if "base_python" not in env_conf:
+        return None
+    for base_python in env_conf["base_python"]:
+        info = get_interpreter(base_python, try_first_with=discover, env=os.environ)
+        if info is not None:
+            return [info.system_executable or info.executable, info.version]
+    return None
+
+
+def get_dir_size(path: Path) -> int:
+    """Get the total size of files under the path"""
+    size = 0
+    for root, _, files in os.walk(str(path)):
+        for file in files:
+            file_path = os.path.join(root, file)
+            if not os.path.islink(file_path):
+                size += os.path.getsize(file_path)
+    return size
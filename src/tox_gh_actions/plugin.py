@@ -1,8 +1,10 @@
 from itertools import product
 from logging import getLogger
 import os
+from pathlib import Path
+import re
 import sys
-from typing import Any, Dict, Iterable, List
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
 from tox.config.cli.parser import Parsed
 from tox.config.loader.memory import MemoryLoader
@@ -10,15 +12,37 @@ from tox.config.loader.section import Section
 from tox.config.loader.str_convert import StrConvert
 from tox.config.main import Config
 from tox.config.of_type import _PLACE_HOLDER
-from tox.config.sets import ConfigSet, CoreConfigSet
+from tox.config.sets import ConfigSet, CoreConfigSet, EnvConfigSet
 from tox.config.types import EnvList
 from tox.execute.api import Outcome
 from tox.plugin import impl
 from tox.session.state import State
 from tox.tox_env.api import ToxEnv
 
+from .env_store import ENV_STORE_PATH_VARIABLE, get_env_key, get_env_store
+
 logger = getLogger(__name__)
 
+# Key of the constant config added to environments to persist
+ENV_STORE_KEY = "gh_actions_env_store_key"
+
+# Maximum number of error annotations emitted per tox environment.
+# GitHub Actions shows at most 10 error annotations per step anyway.
+MAX_ERROR_ANNOTATIONS = 10
+
+# A single pattern matching failure lines reported by common tools:
+# - pytest tracebacks: "tests/test_foo.py:98: AssertionError"
+# - mypy: "src/foo.py:12: error: Incompatible types in assignment"
+# - flake8: "src/foo.py:12:5: E501 line too long (90 > 88 characters)"
+FAILURE_LINE_PATTERN = re.compile(
+    r"(?P<file>(?:[A-Za-z]:)?[^\s:]+?\.pyi?):(?P<line>\d+):(?:(?P<col>\d+):)? "
+    r"(?P<message>(?:error: |[A-Z]+\d+ |[\w.]*(?:Error|Exception|Failed)\b).*?)"
+    r"\r?$"
+)
+
+# ANSI escape sequences for colored output (e.g., when FORCE_COLOR is set)
+ANSI_ESCAPE_PATTERN = re.compile(r"\x1b\[[0-9;]*m|\x1b\(B")
+
 
 @impl
 def tox_add_core_config(core_conf: ConfigSet, state: State) -> None:
@@ -58,6 +82,47 @@ def tox_add_core_config(core_conf: ConfigSet, state: State) -> None:
         )
 
 
+@impl
+def tox_add_env_config(env_conf: EnvConfigSet, state: State) -> None:
+    if not is_running_on_actions():
+        return
+    if env_conf.env_name not in load_persistent_envs(state.conf):
+        return
+    elif not is_env_selected(state.conf, env_conf.env_name):
+        # tox builds configurations of all environments including ones not to run
+        logger.debug("not restoring env which is not selected: %s", env_conf.env_name)
+        return
+    store = get_env_store()
+    if store is None:
+        logger.warning(
+            "tox-gh-actions won't persist %s because the env store (%s) "
+            "is not available",
+            env_conf.env_name,
+            ENV_STORE_PATH_VARIABLE,
+        )
+        return
+
+    key = get_env_key(env_conf, getattr(state.conf.options, "discover", ()))
+    env_conf.add_constant(
+        keys=[ENV_STORE_KEY],
+        desc="key of this environment in the env store of tox-gh-actions",
+        value=key,
+    )
+    env_dir: Path = env_conf["env_dir"]
+    if not is_env_run_command(state.conf.options):
+        return
+    elif getattr(state.conf.options, "recreate", False):
+        logger.debug("not restoring env because it will be recreated: %s", env_dir)
+        return
+    elif env_dir.exists():
+        logger.debug("not restoring env because env dir already exists: %s", env_dir)
+        return
+    try:
+        store.restore(key, env_dir)
+    except OSError as e:
+        logger.warning("tox-gh-actions couldn't restore env from the store: %s", e)
+
+
 @impl
 def tox_before_run_commands(tox_env: ToxEnv) -> None:
     if is_log_grouping_enabled(tox_env.options):
@@ -74,6 +139,63 @@ def tox_after_run_commands(
 ) -> None:
     if is_log_grouping_enabled(tox_env.options):
         print("::endgroup::")
+    if is_running_on_actions():
+        annotator = ErrorAnnotator()
+        for outcome in outcomes:
+            if outcome.exit_code != Outcome.OK:
+                annotator.feed(outcome.out)
+                annotator.feed(outcome.err)
+    if ENV_STORE_KEY in tox_env.conf:
+        store = get_env_store()
+        if store is not None:
+            try:
+                store.save(tox_env.conf[ENV_STORE_KEY], tox_env.env_dir)
+            except OSError as e:
+                logger.warning("tox-gh-actions couldn't save env to the store: %s", e)
+
+
+class ErrorAnnotator:
+    """Emit error annotations for failures found in output of tox environments
+
+    Output is scanned line by line using FAILURE_LINE_PATTERN.
+    Duplicated failures are reported only once and the number of annotations
+    is limited to avoid flooding the workflow log.
+    """
+
+    def __init__(self, limit: int = MAX_ERROR_ANNOTATIONS) -> None:
+        self.limit = limit
+        self.count = 0
+        self._seen: Set[Tuple[str, str, Optional[str], str]] = set()
+
+    def feed(self, text: str) -> None:
+        for line in text.splitlines():
+            if self.count >= self.limit:
+                logger.debug("reached the limit of error annotations: %d", self.limit)
+                return
+            self.feed_line(line)
+
+    def feed_line(self, line: str) -> Optional[str]:
+        """Print and return an annotation when the line reports a failure"""
+        if self.count >= self.limit:
+            return None
+        if "\x1b" in line:
+            line = ANSI_ESCAPE_PATTERN.sub("", line)
+        match = FAILURE_LINE_PATTERN.match(line)
+        if match is None:
+            return None
+        key = (
+            match.group("file"),
+            match.group("line"),
+            match.group("col"),
+            match.group("message"),
+        )
+        if key in self._seen:
+            return None
+        self._seen.add(key)
+        self.count += 1
+        annotation = format_error_annotation(*key)
+        print(annotation)
+        return annotation
 
 
 class EmptyConfigSet(ConfigSet):
@@ -107,6 +229,15 @@ def load_config(config: Config) -> Dict[str, Dict[str, Any]]:
     }
 
 
+def load_persistent_envs(config: Config) -> List[str]:
+    """Load a list of environments to persist in the env store"""
+    for loader in load_config_section(config, "gh-actions").loaders:
+        if "persistent_envs" in loader.found_keys():
+            raw = loader.load_raw("persistent_envs", None, None)
+            return StrConvert.to_env_list(raw).envs
+    return []
+
+
 def load_config_section(config: Config, section_name: str) -> ConfigSet:
     return config.get_section_config(
         Section(None, section_name), base=[], of_type=EmptyConfigSet, for_env=None
@@ -224,6 +355,51 @@ def is_log_grouping_enabled(options: Parsed) -> bool:
     return True
 
 
+def format_error_annotation(
+    file: str, line: str, col: Optional[str], message: str
+) -> str:
+    """Format an error annotation using the workflow command syntax
+
+    See the following document for the syntax.
+    https://docs.github.com/en/actions/using-workflows/workflow-commands-for-github-actions#setting-an-error-message
+    """
+    properties = "file=" + escape_property(file) + ",line=" + line
+    if col is not None:
+        properties += ",col=" + col
+    return "::error " + properties + "::" + escape_data(message)
+
+
+def escape_data(value: str) -> str:
+    """Escape a message of a workflow command"""
+    return value.replace("%", "%25").replace("\r", "%0D").replace("\n", "%0A")
+
+
+def escape_property(value: str) -> str:
+    """Escape a property value of a workflow command"""
+    return escape_data(value).replace(":", "%3A").replace(",", "%2C")
+
+
+def is_env_run_command(options: Parsed) -> bool:
+    """Returns True when the tox command sets up environments to run them"""
+    command = getattr(options, "command", "legacy")
+    if command == "legacy":
+        # The legacy command can also list environments or show the configuration
+        return not any(
+            getattr(options, attr, False)
+            for attr in ("list_envs", "list_envs_all", "show_config")
+        )
+    return command in ("run", "r", "run-parallel", "p", "exec", "e")
+
+
+def is_env_selected(config: Config, env_name: Optional[str]) -> bool:
+    """Returns True when the environment is selected to run"""
+    if is_env_specified(config):
+        cli_env = config.options.env
+        return bool(cli_env.is_all) or env_name in list(cli_env)
+    envlist: EnvList = config.core["envlist"]
+    return env_name in envlist.envs
+
+
 def is_env_specified(config: Config) -> bool:
     """Returns True when environments are explicitly given"""
     # is_default_list becomes False when TOXENV is a non-empty string
@@ -0,0 +1,189 @@
+from pathlib import Path
+import shutil
+from typing import Any, Dict, Optional
+
+import pytest
+from pytest import MonkeyPatch
+from pytest_mock import MockerFixture
+
+from tox_gh_actions import env_store
+
+
+def create_env(path: Path, size: int = 10) -> Path:
+    (path / "bin").mkdir(parents=True)
+    (path / "bin" / "python").write_bytes(b"x" * size)
+    (path / "log").mkdir()
+    (path / "log" / "1-commands.log").write_text("log")
+    return path
+
+
+def test_save_and_restore(tmp_path: Path) -> None:
+    store = env_store.EnvStore(tmp_path / "store", 1024)
+    env_dir = create_env(tmp_path / "work" / "py38")
+
+    assert store.save("py38-abc", env_dir)
+    assert not store.save("py38-abc", env_dir)
+
+    restored_dir = tmp_path / "restored" / "py38"
+    assert store.restore("py38-abc", restored_dir)
+    assert (restored_dir / "bin" / "python").read_bytes() == b"x" * 10
+    # Directories recreated by tox are not stored
+    assert not (restored_dir / "log").exists()
+    assert not store.restore("py38-def", tmp_path / "restored" / "py39")
+
+
+def test_save_replaces_env_recreated_by_tox(tmp_path: Path) -> None:
+    store = env_store.EnvStore(tmp_path / "store", 1024)
+    store.save("env1", create_env(tmp_path / "env1", size=10))
+    restored_dir = tmp_path / "restored"
+    store.restore("env1", restored_dir)
+    assert not store.save("env1", restored_dir)
+
+    # Emulate tox recreating the restored env
+    shutil.rmtree(restored_dir)
+    create_env(restored_dir, size=20)
+    assert store.save("env1", restored_dir)
+
+    assert (tmp_path / "store" / "env1" / "bin" / "python").read_bytes() == b"x" * 20
+    assert not store.save("env1", restored_dir)
+
+
+def test_save_skips_env_exceeding_limit(tmp_path: Path) -> None:
+    store = env_store.EnvStore(tmp_path / "store", 15)
+    assert store.save("env1", create_env(tmp_path / "env1", size=10))
+    assert not store.save("env2", create_env(tmp_path / "env2", size=20))
+
+    assert (tmp_path / "store" / "env1").is_dir()
+    assert not (tmp_path / "store" / "env2").exists()
+    assert not store.restore("env2", tmp_path / "restored")
+
+
+def test_restore_keeps_existing_env_dir(tmp_path: Path) -> None:
+    store = env_store.EnvStore(tmp_path / "store", 1024)
+    store.save("env1", create_env(tmp_path / "env1"))
+    existing_dir = create_env(tmp_path / "existing", size=20)
+
+    assert not store.restore("env1", existing_dir)
+    assert (existing_dir / "bin" / "python").read_bytes() == b"x" * 20
+
+
+def test_save_removes_unknown_dirs(tmp_path: Path) -> None:
+    store = env_store.EnvStore(tmp_path / "store", 100)
+    store.save("env1", create_env(tmp_path / "env1", size=60))
+    (tmp_path / "store" / "index.json").write_text("{")
+    # Emulate a save killed in the middle of copying
+    (tmp_path / "store" / ".tmp-killed" / "env").mkdir(parents=True)
+
+    assert store.save("env2", create_env(tmp_path / "env2", size=60))
+
+    assert sorted(p.name for p in (tmp_path / "store").iterdir() if p.is_dir()) == [
+        "env2"
+    ]
+
+
+def test_restore_removes_partial_env(mocker: MockerFixture, tmp_path: Path) -> None:
+    store = env_store.EnvStore(tmp_path / "store", 1024)
+    store.save("env1", create_env(tmp_path / "env1"))
+    restored_dir = tmp_path / "restored"
+
+    def copytree(src: str, dst: str, symlinks: bool) -> None:
+        Path(dst).mkdir()
+        raise OSError("No space left on device")
+
+    mocker.patch("tox_gh_actions.env_store.shutil.copytree", copytree)
+    with pytest.raises(OSError):
+        store.restore("env1", restored_dir)
+    assert not restored_dir.exists()
+
+
+def test_save_evicts_least_recently_used_envs(tmp_path: Path) -> None:
+    store = env_store.EnvStore(tmp_path / "store", 25)
+    store.save("env1", create_env(tmp_path / "env1"))
+    store.save("env2", create_env(tmp_path / "env2"))
+    # Use env1 so that env2 becomes the least recently used env
+    store.restore("env1", tmp_path / "restored")
+
+    store.save("env3", create_env(tmp_path / "env3"))
+
+    assert (tmp_path / "store" / "env1").is_dir()
+    assert not (tmp_path / "store" / "env2").exists()
+    assert (tmp_path / "store" / "env3").is_dir()
+    assert not store.restore("env2", tmp_path / "env2-restored")
+
+
+def test_restore_with_broken_index(tmp_path: Path) -> None:
+    store = env_store.EnvStore(tmp_path / "store", 1024)
+    store.save("env1", create_env(tmp_path / "env1"))
+    (tmp_path / "store" / "index.json").write_text("{")
+
+    assert not store.restore("env1", tmp_path / "restored")
+    assert store.save("env1", tmp_path / "env1")
+    assert store.restore("env1", tmp_path / "restored")
+
+
+@pytest.mark.parametrize(
+    "environ,expected_max_size",
+    [
+        ({}, None),
+        ({"TOX_GH_ACTIONS_ENV_STORE": "store"}, 5120 * 1024 * 1024),
+        (
+            {
+                "TOX_GH_ACTIONS_ENV_STORE": "store",
+                "TOX_GH_ACTIONS_ENV_STORE_MAX_SIZE_MB": "100",
+            },
+            100 * 1024 * 1024,
+        ),
+        (
+            {
+                "TOX_GH_ACTIONS_ENV_STORE": "store",
+                "TOX_GH_ACTIONS_ENV_STORE_MAX_SIZE_MB": "invalid",
+            },
+            5120 * 1024 * 1024,
+        ),
+    ],
+)
+def test_get_env_store(
+    mocker: MockerFixture,
+    monkeypatch: MonkeyPatch,
+    tmp_path: Path,
+    environ: Dict[str, str],
+    expected_max_size: Optional[int],
+) -> None:
+    mocker.patch("tox_gh_actions.env_store.os.environ", environ)
+    monkeypatch.chdir(tmp_path)
+    store = env_store.get_env_store()
+    if expected_max_size is None:
+        assert store is None
+    else:
+        assert store is not None
+        assert store.path == Path("store")
+        assert store.max_size == expected_max_size
+
+
+def test_get_env_store_with_unusable_path(
+    mocker: MockerFixture, tmp_path: Path
+) -> None:
+    (tmp_path / "file").write_text("")
+    mocker.patch(
+        "tox_gh_actions.env_store.os.environ",
+        {"TOX_GH_ACTIONS_ENV_STORE": str(tmp_path / "file" / "store")},
+    )
+    assert env_store.get_env_store() is None
+
+
+def test_get_base_python(mocker: MockerFixture) -> None:
+    info = mocker.Mock(system_executable="/usr/bin/python3.11", version="3.11.7")
+    get_interpreter = mocker.patch(
+        "tox_gh_actions.env_store.get_interpreter", side_effect=[None, info]
+    )
+    env_conf: Any = {"base_python": ["python3.12", "python3.11"]}
+
+    assert env_store.get_base_python(env_conf, ["/opt/python"]) == [
+        "/usr/bin/python3.11",
+        "3.11.7",
+    ]
+    assert [c.args[0] for c in get_interpreter.call_args_list] == [
+        "python3.12",
+        "python3.11",
+    ]
+    assert get_interpreter.call_args.kwargs["try_first_with"] == ["/opt/python"]
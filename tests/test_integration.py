@@ -1,3 +1,5 @@
+from pathlib import Path
+import shutil
 import sys
 
 import pytest
@@ -100,3 +102,128 @@ python =
         f"py{sys.version_info[0]}{sys.version_info[1]} -> [no description]",
         "",
     ] == result.out.splitlines()[:3]
+
+
+@pytest.mark.integration
+@requires_cpython
+def test_error_annotations_for_failed_env(
+    monkeypatch: MonkeyPatch, tox_project: ToxProjectCreator
+) -> None:
+    monkeypatch.setenv("GITHUB_ACTIONS", "true")
+    monkeypatch.delenv("TOXENV", raising=False)
+    env = f"py{sys.version_info[0]}{sys.version_info[1]}"
+    version = f"{sys.version_info[0]}.{sys.version_info[1]}"
+    tox_ini = f"""
+[tox]
+envlist = {env}
+
+[testenv]
+package = skip
+commands = python fail.py
+
+[gh-actions]
+python =
+    {version}: {env}
+"""
+    fail_py = """
+print("src/foo.py:12: error: Incompatible types  [assignment]")
+print("src/foo.py:12: error: Incompatible types  [assignment]")
+raise SystemExit(1)
+"""
+    project = tox_project({"tox.ini": tox_ini, "fail.py": fail_py})
+
+    result = project.run()
+
+    result.assert_failed()
+    annotation = (
+        "::error file=src/foo.py,line=12::error: Incompatible types  [assignment]"
+    )
+    assert result.out.splitlines().count(annotation) == 1
+
+
+@pytest.mark.integration
+@requires_cpython
+def test_persistent_envs(
+    monkeypatch: MonkeyPatch, tox_project: ToxProjectCreator, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("GITHUB_ACTIONS", "true")
+    monkeypatch.setenv("TOX_GH_ACTIONS_ENV_STORE", str(tmp_path / "store"))
+    monkeypatch.delenv("TOXENV", raising=False)
+    env = f"py{sys.version_info[0]}{sys.version_info[1]}"
+    version = f"{sys.version_info[0]}.{sys.version_info[1]}"
+    tox_ini = f"""
+[tox]
+envlist = {env}
+
+[testenv]
+package = skip
+commands = python -c 'print("hello")'
+
+[gh-actions]
+python =
+    {version}: {env}
+persistent_envs = {env}
+"""
+    project = tox_project({"tox.ini": tox_ini})
+
+    result = project.run("-vv")
+    result.assert_success()
+    assert "saving env to the store" in result.out
+
+    # Emulate a new job on the same runner
+    shutil.rmtree(project.path / ".tox")
+    result = project.run("-vv")
+    result.assert_success()
+    assert "restoring env from the store" in result.out
+    assert "env is already in the store" in result.out
+
+    # Don't restore envs which will be recreated
+    shutil.rmtree(project.path / ".tox")
+    result = project.run("-vv", "-r")
+    result.assert_success()
+    assert "restoring env from the store" not in result.out
+    assert "saving env to the store" in result.out
+
+
+@pytest.mark.integration
+@requires_cpython
+def test_persistent_envs_not_selected(
+    monkeypatch: MonkeyPatch, tox_project: ToxProjectCreator, tmp_path: Path
+) -> None:
+    monkeypatch.setenv("GITHUB_ACTIONS", "true")
+    monkeypatch.setenv("TOX_GH_ACTIONS_ENV_STORE", str(tmp_path / "store"))
+    monkeypatch.delenv("TOXENV", raising=False)
+    env = f"py{sys.version_info[0]}{sys.version_info[1]}"
+    version = f"{sys.version_info[0]}.{sys.version_info[1]}"
+    tox_ini = f"""
+[tox]
+envlist = {env}, other
+
+[testenv]
+package = skip
+commands = python -c 'print("hello")'
+
+[testenv:other]
+
+[gh-actions]
+python =
+    {version}: {env}
+persistent_envs = {env}, other
+"""
+    project = tox_project({"tox.ini": tox_ini})
+    project.run("-e", "other").assert_success()
+    shutil.rmtree(project.path / ".tox")
+
+    # other is not selected based on the Python version
+    result = project.run()
+    result.assert_success()
+    assert not (project.path / ".tox" / "other").exists()
+
+    # other is not selected explicitly
+    result = project.run("-e", env)
+    result.assert_success()
+    assert not (project.path / ".tox" / "other").exists()
+
+    result = project.run("-vv", "-e", "other")
+    result.assert_success()
+    assert "restoring env from the store" in result.out
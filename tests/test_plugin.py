@@ -1,4 +1,6 @@
-from typing import Any, Dict, Iterable, List, Tuple
+from argparse import Namespace
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import pytest
 from pytest_mock import MockerFixture
@@ -304,3 +306,116 @@ def test_is_running_on_actions(
 ) -> None:
     mocker.patch("tox_gh_actions.plugin.os.environ", environ)
     assert plugin.is_running_on_actions() == expected
+
+
+@pytest.mark.parametrize(
+    "options,expected",
+    [
+        ({}, True),
+        ({"command": "legacy", "list_envs": False, "show_config": False}, True),
+        ({"command": "legacy", "list_envs": True}, False),
+        ({"command": "legacy", "show_config": True}, False),
+        ({"command": "run"}, True),
+        ({"command": "p"}, True),
+        ({"command": "list"}, False),
+        ({"command": "config"}, False),
+    ],
+)
+def test_is_env_run_command(options: Dict[str, Any], expected: bool) -> None:
+    assert plugin.is_env_run_command(Namespace(**options)) == expected  # type: ignore
+
+
+@pytest.mark.parametrize(
+    "line,expected",
+    [
+        (
+            "tests/test_foo.py:98: AssertionError",
+            "::error file=tests/test_foo.py,line=98::AssertionError",
+        ),
+        (
+            "src/foo.py:12: error: Incompatible types  [assignment]",
+            "::error file=src/foo.py,line=12::error: Incompatible types  [assignment]",
+        ),
+        (
+            "src/foo.py:12:5: E501 line too long (90 > 88 characters)",
+            "::error file=src/foo.py,line=12,col=5::"
+            "E501 line too long (90 > 88 characters)",
+        ),
+        (
+            "src/foo.py:3: error: 100% wrong\r",
+            "::error file=src/foo.py,line=3::error: 100%25 wrong",
+        ),
+        (
+            "C:\\src\\foo.py:3: error: wrong",
+            "::error file=C%3A\\src\\foo.py,line=3::error: wrong",
+        ),
+        (
+            "src/foo.py:1: \x1b[1m\x1b[31merror:\x1b[m Name \"x\" is not defined",
+            "::error file=src/foo.py,line=1::error: Name \"x\" is not defined",
+        ),
+        (
+            "\x1b[1m\x1b[31mtests/test_foo.py\x1b[0m:98: AssertionError\x1b(B\x1b[m",
+            "::error file=tests/test_foo.py,line=98::AssertionError",
+        ),
+        ("tests/test_foo.py::test_bar PASSED", None),
+        ("Traceback  foo.py:1: error: x", None),
+        ("tests/test_foo.py:98: in test_bar", None),
+        ("Success: no issues found in 3 source files", None),
+    ],
+)
+def test_error_annotator_feed_line(
+    capsys: pytest.CaptureFixture[str], line: str, expected: Optional[str]
+) -> None:
+    annotator = plugin.ErrorAnnotator()
+    assert annotator.feed_line(line) == expected
+    assert capsys.readouterr().out == ("" if expected is None else expected + "\n")
+
+
+def test_error_annotator_deduplicates_and_limits(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    annotator = plugin.ErrorAnnotator(limit=2)
+    annotator.feed(
+        "src/a.py:1: error: first\n"
+        "src/a.py:1: error: first\n"
+        "src/a.py:2: error: second\n"
+        "src/a.py:3: error: third\n"
+    )
+    assert annotator.count == 2
+    assert capsys.readouterr().out.splitlines() == [
+        "::error file=src/a.py,line=1::error: first",
+        "::error file=src/a.py,line=2::error: second",
+    ]
+
+
+def create_large_output() -> str:
+    line = "tests/test_foo.py::test_bar[param-{}] PASSED            [ 42%]\n"
+    text = "".join(line.format(i) for i in range(100_000))
+    return text + "src/foo.py:12: error: Incompatible types  [assignment]\n"
+
+
+def test_error_annotator_feed_large_output(
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    annotator = plugin.ErrorAnnotator()
+    annotator.feed(create_large_output())
+    assert annotator.count == 1
+    assert capsys.readouterr().out == (
+        "::error file=src/foo.py,line=12::error: Incompatible types  [assignment]\n"
+    )
+
+
+# Run with `pytest -m benchmark`
+@pytest.mark.benchmark
+def test_error_annotator_throughput() -> None:
+    text = create_large_output()
+    annotator = plugin.ErrorAnnotator()
+
+    start = time.perf_counter()
+    annotator.feed(text)
+    elapsed = time.perf_counter() - start
+
+    assert annotator.count == 1
+    throughput = len(text) / elapsed / 1_000_000
+    # Keep the bound loose to avoid flakiness on slow machines
+    assert throughput > 5, f"throughput: {throughput:.1f} MB/s"